@@ -1,7 +1,11 @@
+use super::distance::*;
 use instant_distance::HnswMap as HNSW;
 use instant_distance::*;
+use rayon::prelude::*;
 use serde::*;
 use sled::Db as DB;
+use sled::IVec;
+use std::cell::RefCell;
 use std::collections::HashMap;
 
 type Error = &'static str;
@@ -9,6 +13,13 @@ type Error = &'static str;
 pub type Data = HashMap<String, String>;
 pub type Embedding = Vec<f32>;
 
+thread_local! {
+    /// The buffers used to query a graph like the visited set and the
+    /// candidate heaps. They are reused across queries on the same
+    /// thread instead of being allocated for every query.
+    static SEARCH: RefCell<Search> = RefCell::new(Search::default());
+}
+
 /// A struct that represents a value that will be stored
 /// in the key-value store of the database. The embedding
 /// dimension must match the dimension set by the
@@ -43,6 +54,11 @@ pub struct GraphConfig {
 /// A struct that represents the data that will be stored in the graph
 /// database as a value. It contains the graph itself and the
 /// configuration of the graph.
+///
+/// The graph store is serialized with bincode instead of JSON since it
+/// is deserialized on every query. The embeddings are stored as raw
+/// floats instead of text that needs to be parsed. Graph stores saved
+/// as JSON by older versions are converted when they're first queried.
 #[derive(Serialize, Deserialize)]
 pub struct GraphStore {
     pub graph: Graph,
@@ -136,30 +152,35 @@ impl Database {
     /// is added or deleted. This means that a value is added or deleted,
     /// the graph needs to be recreated.
     pub fn create_graph(&self, config: GraphConfig) -> Result<(), Error> {
-        let mut keys: Vec<String> = Vec::new();
-        let mut values: Vec<Value> = Vec::new();
+        // Iterating the key-value store is sequential so we collect the
+        // raw entries first. Deserializing and filtering them is the
+        // expensive part which is done in parallel below.
+        let entries: Vec<(IVec, IVec)> =
+            self.value_db.iter().map(|result| result.unwrap()).collect();
 
         // Check if the graph need a filter.
-        let has_filter = config.filter.is_some();
-
-        // Iterate over all values in the database and separate
-        // them into keys and values.
-        for result in self.value_db.iter() {
-            let (key, value) = result.unwrap();
-            let value: Value = serde_json::from_slice(&value).unwrap();
-
-            // Filter the values as provided.
-            // If the value doesn't match the filter, skip it.
-            if has_filter {
-                let filter: &Data = &config.filter.clone().unwrap();
-                if !filter_data_match(&value.data, filter) {
-                    continue;
+        let filter = config.filter.as_ref();
+
+        // Separate the entries into keys and values. The parallel
+        // iterator preserves the order of the entries so the graph
+        // is built from the same sequence of values every time.
+        let (keys, values): (Vec<String>, Vec<Value>) = entries
+            .par_iter()
+            .filter_map(|(key, value)| {
+                let value: Value = serde_json::from_slice(value).unwrap();
+
+                // Filter the values as provided.
+                // If the value doesn't match the filter, skip it.
+                if let Some(filter) = filter {
+                    if !filter_data_match(&value.data, filter) {
+                        return None;
+                    }
                 }
-            }
 
-            keys.push(String::from_utf8_lossy(&key).to_string());
-            values.push(value);
-        }
+                let key = String::from_utf8_lossy(key).to_string();
+                Some((key, value))
+            })
+            .unzip();
 
         // Build the HNSW graph with the given config.
         let graph = Builder::default()
@@ -172,7 +193,7 @@ impl Database {
         let data = {
             let config = config.clone();
             let _data = GraphStore { graph, config };
-            serde_json::to_vec(&_data).unwrap()
+            bincode::serialize(&_data).unwrap()
         };
 
         match self.graph_db.insert(config.name, data) {
@@ -214,26 +235,39 @@ impl Database {
             None => return Err("Graph not found."),
         };
 
-        // Deserialize the graph store.
-        let graph_store: GraphStore =
-            serde_json::from_slice(&graph_store).unwrap();
+        // Deserialize the graph store. Graphs created before the graph
+        // store was serialized with bincode are stored as JSON. Those
+        // are stored again with bincode so they're only parsed once.
+        let graph_store: GraphStore = match bincode::deserialize(&graph_store) {
+            Ok(store) => store,
+            Err(_) => {
+                match serde_json::from_slice::<GraphStore>(&graph_store) {
+                    Ok(store) => {
+                        let data = bincode::serialize(&store).unwrap();
+                        let _ = self.graph_db.insert(name, data);
+                        store
+                    }
+                    Err(_) => return Err("Failed to read graph."),
+                }
+            }
+        };
 
         // Decoy value with the provided embedding.
         // Data is not needed for the query process.
         let point = Value { embedding, data: HashMap::new() };
 
-        // Query the graph.
+        // Query the graph with the search buffers of this thread.
         let graph = graph_store.graph;
-        let mut query = Search::default();
-        let results = graph.search(&point, &mut query);
+        let data: Vec<Data> = SEARCH.with(|search| {
+            let mut search = search.borrow_mut();
+            let results = graph.search(&point, &mut search);
 
-        let mut data: Vec<Data> = Vec::new();
-        for result in results {
-            let value = result.point;
-            data.push(value.data.clone());
-        }
+            // The results are sorted by distance so we only need to
+            // take the first k results instead of cloning the data of
+            // all the candidates and truncating it afterwards.
+            results.take(k).map(|result| result.point.data.clone()).collect()
+        });
 
-        data.truncate(k);
         Ok(data)
     }
 
@@ -249,15 +283,9 @@ impl Database {
 // crate to calculate the distance between two vectors.
 impl instant_distance::Point for Value {
     fn distance(&self, other: &Self) -> f32 {
-        let mut sum = 0.0;
-
-        // Implement Euclidean distance formula.
-        // https://en.wikipedia.org/wiki/Euclidean_distance
-        for i in 0..self.embedding.len().min(other.embedding.len()) {
-            sum += (self.embedding[i] - other.embedding[i]).powi(2);
-        }
-
-        sum.sqrt()
+        // The distance kernel is dispatched to the SIMD instructions
+        // available on the CPU. See the distance module for more info.
+        euclidean(&self.embedding, &other.embedding)
     }
 }
 
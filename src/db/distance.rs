@@ -0,0 +1,287 @@
+use std::sync::OnceLock;
+
+#[cfg(target_arch = "aarch64")]
+use std::arch::aarch64::*;
+#[cfg(target_arch = "x86_64")]
+use std::arch::x86_64::*;
+
+/// A function that calculates the squared Euclidean distance between
+/// two embeddings of the same length.
+type Kernel = fn(&[f32], &[f32]) -> f32;
+
+/// The distance kernels selected for the running CPU.
+struct Kernels {
+    /// Name of the instruction set used by the kernels.
+    isa: &'static str,
+    squared_euclidean: Kernel,
+}
+
+/// The kernels are resolved once on the first distance calculation
+/// so the hot path doesn't need to check the CPU features on every
+/// call. All kernels are compiled into the binary regardless of the
+/// build machine, so the same binary runs on any CPU of its target.
+static KERNELS: OnceLock<Kernels> = OnceLock::new();
+
+/// Calculates the Euclidean distance between two embeddings.
+/// https://en.wikipedia.org/wiki/Euclidean_distance
+///
+/// If the embeddings have different lengths, only the shared
+/// leading dimensions are compared.
+pub fn euclidean(a: &[f32], b: &[f32]) -> f32 {
+    let len = a.len().min(b.len());
+    let kernel = kernels().squared_euclidean;
+    kernel(&a[..len], &b[..len]).sqrt()
+}
+
+/// Returns the name of the instruction set used to calculate the
+/// distances on this CPU. This is useful for diagnostics since the
+/// instruction set is detected at runtime.
+pub fn instruction_set() -> &'static str {
+    kernels().isa
+}
+
+fn kernels() -> &'static Kernels {
+    KERNELS.get_or_init(select_kernels)
+}
+
+/// Picks the fastest kernels supported by the CPU. The order of
+/// preference on x86_64 is AVX-512, AVX2 with FMA, and SSE2. NEON is
+/// always available on aarch64. Other architectures use the portable
+/// scalar implementation.
+fn select_kernels() -> Kernels {
+    #[cfg(target_arch = "x86_64")]
+    {
+        if is_x86_feature_detected!("avx512f") {
+            return Kernels {
+                isa: "AVX-512",
+                squared_euclidean: |a, b| unsafe {
+                    squared_euclidean_avx512(a, b)
+                },
+            };
+        }
+
+        if is_x86_feature_detected!("avx2") && is_x86_feature_detected!("fma") {
+            return Kernels {
+                isa: "AVX2",
+                squared_euclidean: |a, b| unsafe {
+                    squared_euclidean_avx2(a, b)
+                },
+            };
+        }
+
+        // SSE2 is part of the x86_64 baseline.
+        Kernels {
+            isa: "SSE2",
+            squared_euclidean: |a, b| unsafe { squared_euclidean_sse2(a, b) },
+        }
+    }
+
+    #[cfg(target_arch = "aarch64")]
+    {
+        Kernels {
+            isa: "NEON",
+            squared_euclidean: |a, b| unsafe { squared_euclidean_neon(a, b) },
+        }
+    }
+
+    #[cfg(not(any(target_arch = "x86_64", target_arch = "aarch64")))]
+    {
+        Kernels { isa: "scalar", squared_euclidean: squared_euclidean_scalar }
+    }
+}
+
+/// Calculates the squared Euclidean distance without SIMD instructions.
+/// This is the fallback for architectures without a SIMD kernel and
+/// the reference the SIMD kernels are tested against.
+pub fn squared_euclidean_scalar(a: &[f32], b: &[f32]) -> f32 {
+    a.iter().zip(b).map(|(x, y)| (x - y) * (x - y)).sum()
+}
+
+// The SIMD kernels below accumulate 4 registers at a time into
+// independent sums so consecutive additions don't wait on each other.
+// The remaining full registers are added to the first sum and the
+// remaining dimensions fall back to the scalar kernel.
+//
+// The kernels panic if the slices have different lengths so a safe
+// Kernel pointer can't read out of bounds. They are public so that
+// every kernel can be tested regardless of the one selected at runtime.
+
+/// Calculates the squared Euclidean distance with AVX-512F.
+///
+/// # Safety
+///
+/// The CPU must support AVX-512F.
+#[cfg(target_arch = "x86_64")]
+#[target_feature(enable = "avx512f")]
+pub unsafe fn squared_euclidean_avx512(a: &[f32], b: &[f32]) -> f32 {
+    // The loads below are only bounded by the length of a.
+    assert_eq!(a.len(), b.len());
+    let (pa, pb) = (a.as_ptr(), b.as_ptr());
+    let diff = |i: usize| {
+        _mm512_sub_ps(_mm512_loadu_ps(pa.add(i)), _mm512_loadu_ps(pb.add(i)))
+    };
+
+    let mut sum0 = _mm512_setzero_ps();
+    let mut sum1 = _mm512_setzero_ps();
+    let mut sum2 = _mm512_setzero_ps();
+    let mut sum3 = _mm512_setzero_ps();
+
+    let mut i = 0;
+    while i + 64 <= a.len() {
+        let (d0, d1, d2, d3) =
+            (diff(i), diff(i + 16), diff(i + 32), diff(i + 48));
+        sum0 = _mm512_fmadd_ps(d0, d0, sum0);
+        sum1 = _mm512_fmadd_ps(d1, d1, sum1);
+        sum2 = _mm512_fmadd_ps(d2, d2, sum2);
+        sum3 = _mm512_fmadd_ps(d3, d3, sum3);
+        i += 64;
+    }
+
+    while i + 16 <= a.len() {
+        let d = diff(i);
+        sum0 = _mm512_fmadd_ps(d, d, sum0);
+        i += 16;
+    }
+
+    let sum =
+        _mm512_add_ps(_mm512_add_ps(sum0, sum1), _mm512_add_ps(sum2, sum3));
+    _mm512_reduce_add_ps(sum) + squared_euclidean_scalar(&a[i..], &b[i..])
+}
+
+/// Calculates the squared Euclidean distance with AVX2 and FMA.
+///
+/// # Safety
+///
+/// The CPU must support AVX2 and FMA.
+#[cfg(target_arch = "x86_64")]
+#[target_feature(enable = "avx2,fma")]
+pub unsafe fn squared_euclidean_avx2(a: &[f32], b: &[f32]) -> f32 {
+    // The loads below are only bounded by the length of a.
+    assert_eq!(a.len(), b.len());
+    let (pa, pb) = (a.as_ptr(), b.as_ptr());
+    let diff = |i: usize| {
+        _mm256_sub_ps(_mm256_loadu_ps(pa.add(i)), _mm256_loadu_ps(pb.add(i)))
+    };
+
+    let mut sum0 = _mm256_setzero_ps();
+    let mut sum1 = _mm256_setzero_ps();
+    let mut sum2 = _mm256_setzero_ps();
+    let mut sum3 = _mm256_setzero_ps();
+
+    let mut i = 0;
+    while i + 32 <= a.len() {
+        let (d0, d1, d2, d3) =
+            (diff(i), diff(i + 8), diff(i + 16), diff(i + 24));
+        sum0 = _mm256_fmadd_ps(d0, d0, sum0);
+        sum1 = _mm256_fmadd_ps(d1, d1, sum1);
+        sum2 = _mm256_fmadd_ps(d2, d2, sum2);
+        sum3 = _mm256_fmadd_ps(d3, d3, sum3);
+        i += 32;
+    }
+
+    while i + 8 <= a.len() {
+        let d = diff(i);
+        sum0 = _mm256_fmadd_ps(d, d, sum0);
+        i += 8;
+    }
+
+    let sum =
+        _mm256_add_ps(_mm256_add_ps(sum0, sum1), _mm256_add_ps(sum2, sum3));
+    hsum_avx2(sum) + squared_euclidean_scalar(&a[i..], &b[i..])
+}
+
+/// Calculates the squared Euclidean distance with SSE2.
+///
+/// # Safety
+///
+/// The CPU must support SSE2.
+#[cfg(target_arch = "x86_64")]
+#[target_feature(enable = "sse2")]
+pub unsafe fn squared_euclidean_sse2(a: &[f32], b: &[f32]) -> f32 {
+    // The loads below are only bounded by the length of a.
+    assert_eq!(a.len(), b.len());
+    let (pa, pb) = (a.as_ptr(), b.as_ptr());
+    let square = |i: usize| {
+        let diff = _mm_sub_ps(_mm_loadu_ps(pa.add(i)), _mm_loadu_ps(pb.add(i)));
+        _mm_mul_ps(diff, diff)
+    };
+
+    let mut sum0 = _mm_setzero_ps();
+    let mut sum1 = _mm_setzero_ps();
+    let mut sum2 = _mm_setzero_ps();
+    let mut sum3 = _mm_setzero_ps();
+
+    let mut i = 0;
+    while i + 16 <= a.len() {
+        sum0 = _mm_add_ps(sum0, square(i));
+        sum1 = _mm_add_ps(sum1, square(i + 4));
+        sum2 = _mm_add_ps(sum2, square(i + 8));
+        sum3 = _mm_add_ps(sum3, square(i + 12));
+        i += 16;
+    }
+
+    while i + 4 <= a.len() {
+        sum0 = _mm_add_ps(sum0, square(i));
+        i += 4;
+    }
+
+    let sum = _mm_add_ps(_mm_add_ps(sum0, sum1), _mm_add_ps(sum2, sum3));
+    hsum_sse2(sum) + squared_euclidean_scalar(&a[i..], &b[i..])
+}
+
+/// Adds up the 8 lanes of an AVX register into a single float.
+#[cfg(target_arch = "x86_64")]
+#[target_feature(enable = "avx2")]
+unsafe fn hsum_avx2(v: __m256) -> f32 {
+    let hi = _mm256_extractf128_ps(v, 1);
+    let lo = _mm256_castps256_ps128(v);
+    hsum_sse2(_mm_add_ps(lo, hi))
+}
+
+/// Adds up the 4 lanes of an SSE register into a single float.
+#[cfg(target_arch = "x86_64")]
+#[target_feature(enable = "sse2")]
+unsafe fn hsum_sse2(v: __m128) -> f32 {
+    let sum = _mm_add_ps(v, _mm_movehl_ps(v, v));
+    let sum = _mm_add_ss(sum, _mm_shuffle_ps(sum, sum, 1));
+    _mm_cvtss_f32(sum)
+}
+
+/// Calculates the squared Euclidean distance with NEON.
+///
+/// # Safety
+///
+/// The CPU must support NEON.
+#[cfg(target_arch = "aarch64")]
+#[target_feature(enable = "neon")]
+pub unsafe fn squared_euclidean_neon(a: &[f32], b: &[f32]) -> f32 {
+    // The loads below are only bounded by the length of a.
+    assert_eq!(a.len(), b.len());
+    let (pa, pb) = (a.as_ptr(), b.as_ptr());
+    let diff = |i: usize| vsubq_f32(vld1q_f32(pa.add(i)), vld1q_f32(pb.add(i)));
+
+    let mut sum0 = vdupq_n_f32(0.0);
+    let mut sum1 = vdupq_n_f32(0.0);
+    let mut sum2 = vdupq_n_f32(0.0);
+    let mut sum3 = vdupq_n_f32(0.0);
+
+    let mut i = 0;
+    while i + 16 <= a.len() {
+        let (d0, d1, d2, d3) =
+            (diff(i), diff(i + 4), diff(i + 8), diff(i + 12));
+        sum0 = vfmaq_f32(sum0, d0, d0);
+        sum1 = vfmaq_f32(sum1, d1, d1);
+        sum2 = vfmaq_f32(sum2, d2, d2);
+        sum3 = vfmaq_f32(sum3, d3, d3);
+        i += 16;
+    }
+
+    while i + 4 <= a.len() {
+        let d = diff(i);
+        sum0 = vfmaq_f32(sum0, d, d);
+        i += 4;
+    }
+
+    let sum = vaddq_f32(vaddq_f32(sum0, sum1), vaddq_f32(sum2, sum3));
+    vaddvq_f32(sum) + squared_euclidean_scalar(&a[i..], &b[i..])
+}
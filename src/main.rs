@@ -1,4 +1,5 @@
 use oasysdb::db::database::*;
+use oasysdb::db::distance::*;
 use oasysdb::*;
 
 // Other imports.
@@ -29,6 +30,7 @@ fn rocket() -> _ {
     // Display log.
     println!("OasysDB is running on port 3141.");
     println!("OasysDB accepts embeddings of {} dimension.", dimension);
+    println!("OasysDB calculates distances with {}.", instruction_set());
 
     let db = Database::new(config);
     create_server(db)
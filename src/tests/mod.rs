@@ -1,12 +1,14 @@
 use crate::api::*;
 use crate::create_server;
 use crate::db::database::*;
+use crate::db::distance::*;
 use rand::random;
 use rocket::http::*;
 use rocket::local::blocking::Client;
 use std::collections::HashMap;
 use std::env;
 
+mod test_distance;
 mod test_graphs;
 mod test_utils;
 mod test_values;
@@ -0,0 +1,83 @@
+use super::*;
+
+/// Dimensions that don't fill the SIMD lanes evenly as well as
+/// dimensions that do.
+const DIMENSIONS: [usize; 10] = [1, 2, 7, 8, 15, 16, 17, 100, 128, 1536];
+
+/// Calculates the Euclidean distance without any SIMD instructions
+/// as a reference for the dispatched distance kernels.
+fn naive_euclidean(a: &[f32], b: &[f32]) -> f32 {
+    let sum: f32 = a.iter().zip(b).map(|(x, y)| (x - y).powi(2)).sum();
+    sum.sqrt()
+}
+
+/// Asserts that the distance function matches the reference function
+/// for random embeddings of all the test dimensions.
+fn assert_distance(
+    distance: impl Fn(&[f32], &[f32]) -> f32,
+    reference: impl Fn(&[f32], &[f32]) -> f32,
+) {
+    for dimension in DIMENSIONS {
+        let a: Vec<f32> = (0..dimension).map(|_| random::<f32>()).collect();
+        let b: Vec<f32> = (0..dimension).map(|_| random::<f32>()).collect();
+
+        let expected = reference(&a, &b);
+        let tolerance = 1e-4 * expected.max(1.0);
+        assert!((expected - distance(&a, &b)).abs() < tolerance);
+    }
+}
+
+#[test]
+fn test_euclidean() {
+    assert_distance(euclidean, naive_euclidean);
+}
+
+#[test]
+fn test_euclidean_different_length() {
+    let a = vec![1.0, 2.0, 3.0];
+    let b = vec![1.0, 2.0];
+    assert_eq!(euclidean(&a, &b), 0.0);
+}
+
+// The tests below run every x86_64 kernel supported by the CPU since
+// test_euclidean only covers the kernel selected for the test machine.
+
+#[test]
+#[cfg(target_arch = "x86_64")]
+fn test_squared_euclidean_sse2() {
+    let kernel = |a: &[f32], b: &[f32]| unsafe { squared_euclidean_sse2(a, b) };
+    assert_distance(kernel, squared_euclidean_scalar);
+}
+
+#[test]
+#[cfg(target_arch = "x86_64")]
+fn test_squared_euclidean_avx2() {
+    if !is_x86_feature_detected!("avx2") || !is_x86_feature_detected!("fma") {
+        println!("Skipped: the CPU doesn't support AVX2 and FMA.");
+        return;
+    }
+
+    let kernel = |a: &[f32], b: &[f32]| unsafe { squared_euclidean_avx2(a, b) };
+    assert_distance(kernel, squared_euclidean_scalar);
+}
+
+#[test]
+#[cfg(target_arch = "x86_64")]
+fn test_squared_euclidean_avx512() {
+    if !is_x86_feature_detected!("avx512f") {
+        println!("Skipped: the CPU doesn't support AVX-512.");
+        return;
+    }
+
+    let kernel =
+        |a: &[f32], b: &[f32]| unsafe { squared_euclidean_avx512(a, b) };
+    assert_distance(kernel, squared_euclidean_scalar);
+}
+
+#[test]
+#[should_panic]
+#[cfg(target_arch = "x86_64")]
+fn test_squared_euclidean_different_length() {
+    let (a, b) = (vec![0.0; 8], vec![0.0; 4]);
+    unsafe { squared_euclidean_sse2(&a, &b) };
+}
@@ -1,4 +1,21 @@
 use super::*;
+use instant_distance::Builder;
+
+/// Queries the graph with the given name using a zero embedding and
+/// returns the response status with the data of the nearest values.
+fn send_query(client: &Client, name: &str, k: usize) -> (Status, Vec<Data>) {
+    let embedding = vec![0.0, 0.0];
+    let data = QueryGraphBody { embedding, k: Some(k) };
+    let body = serde_json::to_string(&data).unwrap();
+
+    let uri = format!("/graphs/{}/query", name);
+    let header = get_auth_header();
+    let response =
+        client.post(uri.as_str()).body(body).header(header).dispatch();
+
+    let status = response.status();
+    (status, response.into_json().unwrap_or_default())
+}
 
 #[test]
 fn test_create_graph() {
@@ -28,21 +45,13 @@ fn test_create_graph() {
 fn test_query_graph() {
     let client = create_test_client("test_query_graph");
 
-    // Request body for querying the graph.
-    let embedding = vec![0.0, 0.0];
-    let k = Some(5);
-    let data = QueryGraphBody { embedding, k };
-    let body = serde_json::to_string(&data).unwrap();
-
-    // Query the default graph.
-    let header = get_auth_header();
-    let response = client
-        .post("/graphs/default/query")
-        .body(body)
-        .header(header)
-        .dispatch();
-
-    assert_eq!(response.status(), Status::Ok);
+    // The default graph is built from 9 values so the query returns
+    // k results or all of the values if k is larger than that.
+    for k in [5, 20] {
+        let (status, data) = send_query(&client, "default", k);
+        assert_eq!(status, Status::Ok);
+        assert_eq!(data.len(), k.min(9));
+    }
 }
 
 #[test]
@@ -60,3 +69,46 @@ fn test_reset_graphs() {
     let response = client.delete("/graphs").header(header).dispatch();
     assert_eq!(response.status(), Status::Ok);
 }
+
+#[test]
+fn test_query_json_graph() {
+    env::set_var("OASYSDB_DIMENSION", "2");
+    env::set_var("OASYSDB_TOKEN", "token");
+    let path = "data/tests/test_query_json_graph".to_string();
+
+    // Store a graph as JSON like the versions before the graph store
+    // was serialized with bincode.
+    {
+        let keys: Vec<String> = (0..9).map(|i| i.to_string()).collect();
+        let values: Vec<Value> = (0..9)
+            .map(|_| {
+                let embedding = vec![random::<f32>(); 2];
+                Value { embedding, data: HashMap::new() }
+            })
+            .collect();
+
+        let graph = Builder::default().build(values, keys);
+        let config = GraphConfig {
+            name: "json".to_string(),
+            ef_construction: 10,
+            ef_search: 10,
+            filter: None,
+        };
+
+        let data = serde_json::to_vec(&GraphStore { graph, config }).unwrap();
+        let graph_db = sled::open(format!("{}/graphs", path)).unwrap();
+        graph_db.insert("json", data).unwrap();
+        graph_db.flush().unwrap();
+    }
+
+    let config = Config { path, dimension: 2 };
+    let client = Client::tracked(create_server(Database::new(config))).unwrap();
+
+    // The first query converts the graph to bincode and the second
+    // query reads the converted graph.
+    for _ in 0..2 {
+        let (status, data) = send_query(&client, "json", 5);
+        assert_eq!(status, Status::Ok);
+        assert_eq!(data.len(), 5);
+    }
+}